@@ -40,7 +40,7 @@ class Struct(struct.Struct):
         fields can be post-processed by extending the _post_unpack() method.
         """
         data = super(Struct, self).unpack_from(buf, offset)
-        items = dict(list(zip(self.fields, data)))
+        items = dict(zip(self.fields, data))
         return self._post_unpack(items)
 
     def _post_unpack(self, items):
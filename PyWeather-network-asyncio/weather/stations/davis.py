@@ -29,11 +29,15 @@ import logging
 import serial
 import struct
 import time
-from array import array
 import datetime as dt
 
 log = logging.getLogger(__name__)
 
+try:
+    from binascii import crc_hqx as _crc_hqx
+except ImportError:  # e.g. MicroPython's binascii lacks crc_hqx
+    _crc_hqx = None
+
 # public interfaces for module
 __all__ = ['VantagePro', 'NoDeviceException']
 
@@ -53,10 +57,26 @@ class NoNewRecordsException(Exception):
     pass
 
 
+def _crc_slice_tables(table, n):
+    """
+    derive the 'slice-by-n' tables from a byte-wise CRC-16 table. table k
+    gives the CRC contribution of a byte followed by k zero bytes.
+    """
+    tables = [tuple(table)]
+    for _ in range(n - 1):
+        prev = tables[-1]
+        tables.append(tuple(
+            ((crc << 8) & 0xFFFF) ^ table[crc >> 8] for crc in prev))
+    return tuple(tables)
+
+
 class VProCRC(object):
     """
     Implements CRC algorithm, necessary for encoding and verifying data from
     the Davis Vantage Pro unit.
+
+    The algorithm is CRC-CCITT (XMODEM variant, poly 0x1021, init 0), which is
+    the same CRC computed by `binascii.crc_hqx`.
     """
 
     CRC_TABLE = (
@@ -93,15 +113,34 @@ class VProCRC(object):
         0xef1f, 0xff3e, 0xcf5d, 0xdf7c, 0xaf9b, 0xbfba, 0x8fd9, 0x9ff8,
         0x6e17, 0x7e36, 0x4e55, 0x5e74, 0x2e93, 0x3eb2, 0xed1, 0x1ef0,
     )
+    CRC_TABLES = _crc_slice_tables(CRC_TABLE, 8)
 
     @staticmethod
     def get(data):
         """
         return CRC calc value from raw serial data
         """
+        if _crc_hqx is None:
+            return VProCRC._get_py(data)
+        return _crc_hqx(data, 0)
+
+    @staticmethod
+    def _get_py(data):
+        """
+        pure-Python CRC calc, used when `binascii.crc_hqx` is unavailable.
+        """
+        data = bytes(data)
+        t0, t1, t2, t3, t4, t5, t6, t7 = VProCRC.CRC_TABLES
         crc = 0
-        for byte in array('B', data):
-            crc = (VProCRC.CRC_TABLE[(crc >> 8) ^ byte] ^ ((crc & 0xFF) << 8))
+        # slice-by-8: consume 8 bytes per iteration
+        end = len(data) & ~7
+        for i in range(0, end, 8):
+            b0, b1, b2, b3, b4, b5, b6, b7 = data[i:i + 8]
+            crc = (t7[(crc >> 8) ^ b0] ^ t6[(crc & 0xFF) ^ b1] ^
+                   t5[b2] ^ t4[b3] ^ t3[b4] ^ t2[b5] ^ t1[b6] ^ t0[b7])
+        # remaining tail, byte-wise
+        for byte in data[end:]:
+            crc = t0[(crc >> 8) ^ byte] ^ ((crc << 8) & 0xFF00)
         return crc
 
     @staticmethod
@@ -153,7 +192,6 @@ class LoopStruct(Struct):
         items['TempOut'] = items['TempOut'] / 10.0
         items['RainRate'] = items['RainRate'] / 100.0
         items['RainStorm'] = items['RainStorm'] / 100.0
-        items['StormStartDate'] = self._unpack_storm_date(items['StormStartDate'])
         # rain totals
         items['RainDay'] = items['RainDay'] / 100.0
         items['RainMonth'] = items['RainMonth'] / 100.0
@@ -163,13 +201,13 @@ class LoopStruct(Struct):
         items['ETMonth'] = items['ETMonth'] / 100.0
         items['ETYear'] = items['ETYear'] / 100.0
         # soil moisture + leaf wetness
-        items['SoilMoist'] = struct.unpack('4B', items['SoilMoist'])
-        items['LeafWetness'] = struct.unpack('4B', items['LeafWetness'])
+        items['SoilMoist'] = tuple(items['SoilMoist'])
+        items['LeafWetness'] = tuple(items['LeafWetness'])
         # battery statistics
-        items['BatteryVolts'] = items['BatteryVolts'] * 300 / 512.0 / 100.0
-        # sunrise / sunset
-        items['SunRise'] = self._unpack_time(items['SunRise'])
-        items['SunSet'] = self._unpack_time(items['SunSet'])
+        # volts = raw * 300 / 512 / 100; 3 / 512 is exact in binary
+        items['BatteryVolts'] = items['BatteryVolts'] * 0.005859375
+        # 'SunRise', 'SunSet' and 'StormStartDate' are left packed; see
+        # _unpack_time() and _unpack_storm_date() for string conversion.
         return items
 
     @staticmethod
@@ -213,10 +251,9 @@ class _ArchiveStruct(object):
         items['UV'] = items['UV'] / 10.0
         items['UVHi'] = items['UVHi'] / 10.0
         items['ETHour'] = items['ETHour'] / 1000.0
-        items['SoilTemps'] = tuple(
-            t - 90 for t in struct.unpack('4B', items['SoilTemps']))
-        items['ExtraHum'] = struct.unpack('2B', items['ExtraHum'])
-        items['SoilMoist'] = struct.unpack('4B', items['SoilMoist'])
+        items['SoilTemps'] = tuple(t - 90 for t in items['SoilTemps'])
+        items['ExtraHum'] = tuple(items['ExtraHum'])
+        items['SoilMoist'] = tuple(items['SoilMoist'])
         return items
 
     @staticmethod
@@ -246,9 +283,8 @@ class _ArchiveAStruct(_ArchiveStruct, Struct):
 
     def _post_unpack(self, items):
         items = super(_ArchiveAStruct, self)._post_unpack(items)
-        items['LeafWetness'] = struct.unpack('4B', items['LeafWetness'])
-        items['ExtraTemps'] = tuple(
-            t - 90 for t in struct.unpack('2B', items['ExtraTemps']))
+        items['LeafWetness'] = tuple(items['LeafWetness'])
+        items['ExtraTemps'] = tuple(t - 90 for t in items['ExtraTemps'])
         return items
 
 
@@ -335,11 +371,9 @@ class _ArchiveBStruct(_ArchiveStruct, Struct):
 
     def _post_unpack(self, items):
         items = super(_ArchiveBStruct, self)._post_unpack(items)
-        items['LeafTemps'] = tuple(
-            t - 90 for t in struct.unpack('2B', items['LeafTemps']))
-        items['LeafWetness'] = struct.unpack('2B', items['LeafWetness'])
-        items['ExtraTemps'] = tuple(
-            t - 90 for t in struct.unpack('3B', items['ExtraTemps']))
+        items['LeafTemps'] = tuple(t - 90 for t in items['LeafTemps'])
+        items['LeafWetness'] = tuple(items['LeafWetness'])
+        items['ExtraTemps'] = tuple(t - 90 for t in items['ExtraTemps'])
         return items
 
 
@@ -354,6 +388,13 @@ DmpPageStruct = Struct(
     (('Index', 'B'), ('Records', '260s'), ('unused', '4B'), ('CRC', 'H')),
     order='=')
 
+# pre-compiled formats used when issuing the DMPAFT command
+_pack_time_stamp = struct.Struct('2H').pack
+_pack_crc = struct.Struct('>H').pack  # crc in big-endian format
+
+# leading (DateStamp, TimeStamp) fields shared by Rev.A and Rev.B archives
+_unpack_archive_stamp = struct.Struct('=2H').unpack_from
+
 
 class _TimeStruct(Struct):
     FMT = (
@@ -467,6 +508,24 @@ class VantagePro(Station):
         """
         return 100 * date.hour + date.minute
 
+    def sunrise_str(self):
+        """
+        return the sunrise time of the last reading as "HH:MM" string.
+        """
+        return LoopStruct._unpack_time(self.fields['SunRise'])
+
+    def sunset_str(self):
+        """
+        return the sunset time of the last reading as "HH:MM" string.
+        """
+        return LoopStruct._unpack_time(self.fields['SunSet'])
+
+    def storm_start_date_str(self):
+        """
+        return the storm start date of the last reading as 'YYYY-MM-DD' string.
+        """
+        return LoopStruct._unpack_storm_date(self.fields['StormStartDate'])
+
     def __del__(self):
         """
         close serial port when object is deleted.
@@ -491,6 +550,23 @@ class VantagePro(Station):
 
         return self._ARCHIVE_REV_B
 
+    async def _read(self, size):
+        """
+        read exactly 'size' bytes from the device. short reads are topped up
+        in place, so a packet split across reads does not fail its CRC check
+        and force the whole command to be retried.
+        """
+        data = await self.port.read(size)
+        if len(data) >= size:
+            return data
+        buf = bytearray(data)  # grows in place, instead of re-copying bytes
+        while len(buf) < size:
+            chunk = await self.port.read(size - len(buf))
+            if not chunk:
+                break  # nothing more to read, let the caller check the data
+            buf += chunk
+        return bytes(buf)
+
     async def _wakeup(self) -> None:
         """
         issue wakeup command to device to take out of standby mode.
@@ -501,7 +577,7 @@ class VantagePro(Station):
             try:
                 await self.port.write("\n".encode())
                 ack = await asyncio.wait_for(
-                        self.port.read(len(self.WAKE_ACK)),
+                        self._read(len(self.WAKE_ACK)),
                         timeout=1.2
                         )
                 if ack == self.WAKE_ACK:
@@ -533,7 +609,7 @@ class VantagePro(Station):
                 log.debug("expecting OK rather than ACK in reponse to cmd")
                 try:
                     ack = await asyncio.wait_for(
-                            self.port.read(len(self.OK)),  # read OK
+                            self._read(len(self.OK)),  # read OK
                             timeout=5
                             )
                 except asyncio.exceptions.TimeoutError:
@@ -545,7 +621,7 @@ class VantagePro(Station):
             else:
                 try:
                     ack = await asyncio.wait_for(
-                        self.port.read(len(self.ACK)),  # read ACK
+                        self._read(len(self.ACK)),  # read ACK
                         timeout=1.2
                         )
                 except asyncio.exceptions.TimeoutError:
@@ -562,30 +638,34 @@ class VantagePro(Station):
         provided (in /dev/XXX) format. All reads are non-blocking.
         """
         await self._cmd('LOOP', 1)
-        raw = await self.port.read(LoopStruct.size)  # read data
+        raw = await self._read(LoopStruct.size)  # read data
         return raw
 
     async def _dmpaft_cmd(self, time_fields):
         """
         issue a command to read the archive records after a known time stamp.
+
+        records are not unpacked here; each one is returned as a
+        ((DateStamp, TimeStamp), unpack_from, page, offset) tuple, so that
+        only the records actually needed pay for a full unpack.
         """
         records = []
         # convert time stamp fields to buffer
-        tbuf = struct.pack('2H', *time_fields)
+        tbuf = _pack_time_stamp(*time_fields)
 
         # 1. send 'DMPAFT' cmd
         await self._cmd('DMPAFT')
 
         # 2. send time stamp + crc
         crc = VProCRC.get(tbuf)
-        crc = struct.pack('>H', crc)  # crc in big-endian format
+        crc = _pack_crc(crc)  # crc in big-endian format
         await self.port.write(tbuf + crc)  # send time stamp + crc
-        ack = await self.port.read(len(self.ACK))  # read ACK
+        ack = await self._read(len(self.ACK))  # read ACK
         if ack != self.ACK:
             return None  # if bad ack, return None
 
         # 3. read pre-amble data
-        raw = await self.port.read(DmpStruct.size)
+        raw = await self._read(DmpStruct.size)
         if not VProCRC.verify(raw):  # check CRC value
             await self.port.write(self.ESC)  # if bad, escape and abort
             return
@@ -596,28 +676,34 @@ class VantagePro(Station):
         log.info('reading %d pages, start offset %d' %
                  (dmp['Pages'], dmp['Offset']))
         for i in range(dmp['Pages']):
-            # 5. read page data
-            raw = await self.port.read(DmpPageStruct.size)
+            # 5. read page data. the console only sends the next page after
+            # the current one is ACK'd, so pages cannot be batched into a
+            # single read; one read per page is the minimum.
+            raw = await self._read(DmpPageStruct.size)
             if not VProCRC.verify(raw):  # check CRC value
                 await self.port.write(self.ESC)  # if bad, escape and abort
                 return
             await self.port.write(self.ACK)  # send ACK
 
-            # 6. loop through archive records
-            page = DmpPageStruct.unpack(raw)
+            # 6. loop through archive records. records are unpacked in place,
+            # through a view of the 'Records' field of DmpPageStruct, rather
+            # than from a copy of it.
+            index = raw[0]
+            page = memoryview(raw)[1:261]
             offset = 0  # assume offset at 0
             if i == 0:
                 offset = dmp['Offset'] * ArchiveAStruct.size
+            if self._use_rev_b_archive(page, offset):
+                unpack_archive = ArchiveBStruct.unpack_from
+            else:
+                unpack_archive = ArchiveAStruct.unpack_from
             while offset < ArchiveAStruct.size * 5:
                 log.info('page %d, reading record at offset %d' %
-                         (page['Index'], offset))
-                if self._use_rev_b_archive(page['Records'], offset):
-                    a = ArchiveBStruct.unpack_from(page['Records'], offset)
-                else:
-                    a = ArchiveAStruct.unpack_from(page['Records'], offset)
+                         (index, offset))
+                stamp = _unpack_archive_stamp(page, offset)
                 # 7. verify that record has valid data, and store
-                if a['DateStamp'] != 0xffff and a['TimeStamp'] != 0xffff:
-                    records.append(a)
+                if stamp[0] != 0xffff and stamp[1] != 0xffff:
+                    records.append((stamp, unpack_archive, page, offset))
                 offset += ArchiveAStruct.size
         log.info('read all pages')
         return records
@@ -629,7 +715,7 @@ class VantagePro(Station):
             crc_ok = VProCRC.verify(raw)
             if crc_ok:
                 break  # exit loop if valid
-            time.sleep(1)
+            await asyncio.sleep(1)
 
         if not crc_ok:
             raise NoDeviceException('Can not access weather station')
@@ -646,20 +732,22 @@ class VantagePro(Station):
             records = await self._dmpaft_cmd(self._archive_time)
             if records is not None:
                 break
-            time.sleep(1)
+            await asyncio.sleep(1)
 
         if records is None:
             raise NoNewRecordsException('Can not download any new record.')
 
-        # find the newest record
+        # find the newest record, and only unpack that one
         new_rec = None
-        for r in records:
-            new_time = (r['DateStamp'], r['TimeStamp'])
+        for new_time, unpack_archive, page, offset in records:
             if self._archive_time < new_time:
                 self._archive_time = new_time
-                new_rec = r
+                new_rec = (unpack_archive, page, offset)
 
-        return new_rec
+        if new_rec is None:
+            return None
+        unpack_archive, page, offset = new_rec
+        return unpack_archive(page, offset)
 
     @staticmethod
     def _calc_derived_fields(fields):
@@ -681,6 +769,7 @@ class VantagePro(Station):
         fields['Month'] = str(now[1]).zfill(2)
         now = time.gmtime()
         fields['DateStampUtc'] = time.strftime("%Y-%m-%d %H:%M:%S", now)
+        fields['DateTimeUtc'] = dt.datetime(*now[:6])
         fields['YearUtc'] = now[0]
         fields['MonthUtc'] = str(now[1]).zfill(2)
 
@@ -720,7 +809,7 @@ class VantagePro(Station):
             humidity=fields['HumOut'],
             rain_rate_in=fields['RainRate'],
             rain_day_in=fields['RainDay'],
-            time=dt.datetime.strptime(fields['DateStampUtc'], "%Y-%m-%d %H:%M:%S"),
+            time=fields['DateTimeUtc'],
             wind_speed_mph=fields['WindSpeed10Min'],
             wind_direction=fields['WindDir'],
         )
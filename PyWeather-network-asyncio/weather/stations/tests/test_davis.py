@@ -1,11 +1,13 @@
 
 
+import asyncio
 import codecs
 import datetime
 import mock
+import struct
 import unittest
 
-from ..davis import VProCRC, VantagePro, LoopStruct, _fields_to_weather_point
+from ..davis import VProCRC, VantagePro, LoopStruct, ArchiveBStruct
 from ..station import WeatherPoint
 
 loop_data = (
@@ -21,10 +23,15 @@ class TestCRC(unittest.TestCase):
         result = VProCRC.verify(raw)
         self.assertTrue(result)
 
+    def test_crc_fallback(self):
+        raw = codecs.decode(loop_data, 'hex')
+        self.assertEqual(VProCRC._get_py(raw), 0)
+        self.assertEqual(VProCRC._get_py(raw[:-2]), VProCRC.get(raw[:-2]))
+
 
 class TestParse(unittest.TestCase):
     cmd_mock = mock.Mock()   # for mocking '_cmd' method in 'vp'
-    loop_mock = mock.Mock()  # for mocking '_loop_cmd' method in 'vp'
+    loop_mock = mock.AsyncMock()  # for mocking '_loop_cmd' method in 'vp'
 
     def test_unpack_loop_data(self):
         LoopStruct.unpack(codecs.decode(loop_data, 'hex'))
@@ -34,8 +41,8 @@ class TestParse(unittest.TestCase):
     def test_fields(self):
         self.loop_mock.return_value = codecs.decode(loop_data, 'hex')
         # TODO: this is working just if there is an actual weather station attached.
-        vp = VantagePro('/dev/ttyUSB0')
-        fields = vp._get_loop_fields()
+        vp = VantagePro(mock.Mock())
+        fields = asyncio.run(vp._get_loop_fields())
 
         self.assertAlmostEqual(fields['Pressure'], 29.98499999)
         self.assertAlmostEqual(fields['TempIn'], 73.0)
@@ -49,7 +56,7 @@ class TestParse(unittest.TestCase):
         self.assertEqual(fields['UV'], 0xFF)
         self.assertEqual(fields['SolarRad'], 0x7FFF)
         self.assertEqual(fields['RainStorm'], 0)
-        self.assertEqual(fields['StormStartDate'], '2127-15-31')
+        self.assertEqual(fields['StormStartDate'], 0xFFFF)
         self.assertEqual(fields['RainDay'], 0)
         self.assertEqual(fields['RainMonth'], 0)
         self.assertEqual(fields['RainYear'], 0)
@@ -62,16 +69,25 @@ class TestParse(unittest.TestCase):
         self.assertAlmostEqual(fields['BatteryVolts'], 4.728515625)
         self.assertEqual(fields['ForecastIcon'], 6)
         self.assertEqual(fields['ForecastRuleNo'], 75)
-        self.assertEqual(fields['SunRise'], '05:50')
-        self.assertEqual(fields['SunSet'], '18:54')
+        self.assertEqual(fields['SunRise'], 550)
+        self.assertEqual(fields['SunSet'], 1854)
+
+    @mock.patch.object(VantagePro, '_cmd', cmd_mock)
+    def test_str_fields(self):
+        vp = VantagePro(mock.Mock())
+        vp.fields = LoopStruct.unpack(codecs.decode(loop_data, 'hex'))
+
+        self.assertEqual(vp.sunrise_str(), '05:50')
+        self.assertEqual(vp.sunset_str(), '18:54')
+        self.assertEqual(vp.storm_start_date_str(), '2127-15-31')
 
     @mock.patch.object(VantagePro, '_cmd', cmd_mock)
     @mock.patch.object(VantagePro, '_loop_cmd', loop_mock)
     def test_derived_fields(self):
         self.loop_mock.return_value = codecs.decode(loop_data, 'hex')
         # TODO same as todo above!
-        vp = VantagePro('/dev/ttyUSB0')
-        fields = vp._get_loop_fields()
+        vp = VantagePro(mock.Mock())
+        fields = asyncio.run(vp._get_loop_fields())
         vp._calc_derived_fields(fields)
 
         self.assertAlmostEqual(fields['HeatIndex'], 72.09999999)
@@ -81,10 +97,71 @@ class TestParse(unittest.TestCase):
         self.assertTrue(fields['Year'] > 2000)
         self.assertTrue(1 <= int(fields['Month']) <= 12)
         self.assertNotEqual(fields['DateStampUtc'], '')
+        self.assertEqual(
+            fields['DateTimeUtc'].strftime("%Y-%m-%d %H:%M:%S"),
+            fields['DateStampUtc'])
         self.assertTrue(fields['YearUtc'] > 2000)
         self.assertTrue(1 <= int(fields['MonthUtc']) <= 12)
 
 
+class FakePort(object):
+    """
+    replays canned console replies, one reply per read.
+    """
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.written = []
+
+    async def write(self, data):
+        self.written.append(data)
+
+    async def read(self, size):
+        return self.replies.pop(0)
+
+    def close(self):
+        pass
+
+
+def with_crc(data):
+    return data + struct.pack('>H', VProCRC.get(data))
+
+
+def dmp_page(index, stamps):
+    """
+    build a DMPAFT page of Rev.B archive records with the given time stamps.
+    """
+    records = b''
+    for stamp in stamps:
+        rec = bytearray(ArchiveBStruct.size)  # 'RecType' 0 == Rev.B
+        struct.pack_into('=2H', rec, 0, *stamp)
+        records += rec
+    return with_crc(bytes([index]) + records + b'\0' * 4)
+
+
+class TestArchive(unittest.TestCase):
+    cmd_mock = mock.Mock()   # for mocking '_cmd' method in 'vp'
+
+    @mock.patch.object(VantagePro, '_cmd', cmd_mock)
+    def test_new_archive_fields(self):
+        date = VantagePro.calcDateStamp(datetime.date(2020, 1, 2))
+        empty = (0xffff, 0xffff)
+        port = FakePort([
+            VantagePro.ACK,
+            with_crc(struct.pack('=2H', 2, 1)),  # 2 pages, start offset 1
+            dmp_page(0, [(date + 1, 0)] + [(date, t) for t in range(4)]),
+            dmp_page(1, [(date, 1200), (date, 1210)] + [empty] * 3),
+        ])
+        vp = VantagePro(port)
+        vp._cmd = mock.AsyncMock()
+        fields = asyncio.run(vp._get_new_archive_fields())
+
+        self.assertEqual(vp._ARCHIVE_REV_B, True)
+        self.assertEqual(vp._archive_time, (date, 1210))
+        self.assertEqual((fields['Year'], fields['Month'], fields['Day']),
+                         (2020, 1, 2))
+        self.assertEqual((fields['Hour'], fields['Min']), (12, 10))
+
+
 class TestFieldsToWeatherPoint(unittest.TestCase):
 
     def test_fields_to_weather_point(self):
@@ -96,6 +173,7 @@ class TestFieldsToWeatherPoint(unittest.TestCase):
             'RainRate': 0.1,
             'RainDay': 0.2,
             'DateStampUtc': '2020-01-02 03:04:05',
+            'DateTimeUtc': datetime.datetime(2020, 1, 2, 3, 4, 5),
             'WindSpeed10Min': 5,
             'WindDir': 15
         }
@@ -110,7 +188,7 @@ class TestFieldsToWeatherPoint(unittest.TestCase):
             wind_speed_mph=5,
             wind_direction=15
         )
-        self.assertEqual(_fields_to_weather_point(fields), expected)
+        self.assertEqual(VantagePro._fields_to_weather_point(fields), expected)
 
 
 # vim: sts=4:ts=4:sw=4